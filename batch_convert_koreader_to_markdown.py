@@ -3,7 +3,7 @@
 #   "lupa",
 #   "click",
 #   "rich",
-#   "toml",
+#   "tomli; python_version < '3.11'",
 # ]
 # ///
 
@@ -19,9 +19,8 @@ from rich.table import Table
 
 # Import the conversion functions from the main script
 from koreader_lua_to_markdown import (
-    parse_lua,
-    generate_markdown,
-    save_markdown,
+    convert_batch,
+    find_metadata_files,
     load_config,
 )
 
@@ -35,31 +34,8 @@ logger = logging.getLogger(__name__)
 console = Console()
 
 
-def find_metadata_files(input_dir: Path) -> list[Path]:
-    """
-    Find all metadata.epub.lua files in the directory structure.
-
-    Args:
-        input_dir: Root directory to search
-
-    Returns:
-        List of paths to metadata.epub.lua files
-    """
-    metadata_files = []
-
-    logger.info(f"Searching for metadata files in: {input_dir}")
-
-    # Look for .sdr directories containing metadata.epub.lua
-    for sdr_dir in input_dir.rglob("*.sdr"):
-        metadata_file = sdr_dir / "metadata.epub.lua"
-        if metadata_file.exists():
-            metadata_files.append(metadata_file)
-
-    logger.info(f"Found {len(metadata_files)} metadata files")
-    return metadata_files
-
-
-def batch_convert(input_dir: Path, output_dir: Path, verbose: bool = False, config: Optional[Path] = None) -> None:
+def batch_convert(input_dir: Path, output_dir: Path, verbose: bool = False, config: Optional[Path] = None,
+                  use_cache: bool = True) -> None:
     """
     Batch convert all KOReader metadata files to markdown.
 
@@ -68,6 +44,7 @@ def batch_convert(input_dir: Path, output_dir: Path, verbose: bool = False, conf
         output_dir: Output directory for markdown files
         verbose: Enable verbose logging
         config: Path to TOML configuration file
+        use_cache: Read and write the parsed metadata cache
     """
     # Configure logging level
     if verbose:
@@ -82,11 +59,9 @@ def batch_convert(input_dir: Path, output_dir: Path, verbose: bool = False, conf
         metadata_files = find_metadata_files(input_dir)
 
         if not metadata_files:
-            console.print("[yellow]No metadata.epub.lua files found in the input directory.[/yellow]")
+            console.print("[yellow]No metadata.*.lua files found in the input directory.[/yellow]")
             return
 
-        # Create output directory
-        output_dir.mkdir(parents=True, exist_ok=True)
         logger.info(f"Output directory: {output_dir}")
 
         # Create summary table
@@ -109,38 +84,27 @@ def batch_convert(input_dir: Path, output_dir: Path, verbose: bool = False, conf
 
             task = progress.add_task(f"Converting {total_files} files...", total=total_files)
 
-            for metadata_file in metadata_files:
-                try:
-                    progress.update(task, description=f"Processing {metadata_file.parent.name}...")
-
-                    # Parse the Lua file
-                    metadata = parse_lua(metadata_file)
-
-                    # Generate markdown content
-                    markdown, timestamp = generate_markdown(metadata, app_config)
-
-                    # Generate output filename
-                    filename = f"{timestamp}.md"
-                    output_path = output_dir / filename
-
-                    # Check if file already exists
-                    if output_path.exists():
-                        logger.info(f"⏭️  Skipping {metadata_file.parent.name}: File already exists at {output_path}")
-                        skipped += 1
-                        progress.advance(task)
-                        continue
+            for index, (metadata_file, status, detail) in enumerate(
+                convert_batch(metadata_files, output_dir, app_config, use_cache)
+            ):
+                name = metadata_file.parent.name
 
-                    # Save the markdown
-                    save_markdown(markdown, output_path)
+                # Re-render the description only every few files; terminal
+                # output is slow compared to small conversions
+                if index % 16 == 0:
+                    progress.update(task, description=f"Processing {name}...")
 
+                if status == "converted":
                     successful += 1
-                    logger.info(f"✅ Converted: {metadata_file.parent.name} -> {filename}")
-
-                except Exception as e:
+                    logger.debug("✅ Converted: %s -> %s", name, detail)
+                elif status == "skipped":
+                    skipped += 1
+                    logger.debug("⏭️  Skipping %s: File already exists at %s", name, output_dir / detail)
+                else:
                     failed += 1
-                    logger.error(f"❌ Failed to convert {metadata_file.parent.name}: {e}")
+                    logger.error(f"❌ Failed to convert {name}: {detail}")
                     if verbose:
-                        console.print(f"[red]Error details for {metadata_file.parent.name}: {e}[/red]")
+                        console.print(f"[red]Error details for {name}: {detail}[/red]")
 
                 progress.advance(task)
 
@@ -191,13 +155,21 @@ def batch_convert(input_dir: Path, output_dir: Path, verbose: bool = False, conf
     type=click.Path(exists=True, path_type=Path, dir_okay=False),
     help='Path to TOML configuration file'
 )
-def main(input_dir: Path, output_dir: Path, verbose: bool, config: Optional[Path]) -> None:
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Do not read or write the parsed metadata cache in $XDG_CACHE_HOME/koreader-md (~/.cache/koreader-md); '
+         'setting KOREADER_MD_NO_CACHE has the same effect'
+)
+def main(input_dir: Path, output_dir: Path, verbose: bool, config: Optional[Path], no_cache: bool) -> None:
     """
     Batch convert KOReader metadata files to markdown format.
 
-    This script searches for all metadata.epub.lua files in .sdr subdirectories
+    This script searches for all metadata.*.lua files in .sdr subdirectories
     and converts them to markdown files using the conversion logic from
-    koreader_lua_to_markdown.py.
+    koreader_lua_to_markdown.py. Parsed metadata is cached per file in
+    $XDG_CACHE_HOME/koreader-md and reused while the file is unchanged; pass
+    --no-cache to bypass it.
 
     Examples:
         uv run batch_convert.py --input /path/to/books --output /path/to/output
@@ -213,10 +185,10 @@ def main(input_dir: Path, output_dir: Path, verbose: bool, config: Optional[Path
     # Show conversion info
     console.print(f"📚 Input directory: {input_dir}")
     console.print(f"📝 Output directory: {output_dir}")
-    console.print(f"🔍 Looking for metadata.epub.lua files in .sdr subdirectories...\n")
+    console.print(f"🔍 Looking for metadata.*.lua files in .sdr subdirectories...\n")
 
     # Run batch conversion
-    batch_convert(input_dir, output_dir, verbose, config)
+    batch_convert(input_dir, output_dir, verbose, config, use_cache=not no_cache)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+# Make the top-level script modules importable when running plain `pytest`
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
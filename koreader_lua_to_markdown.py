@@ -2,20 +2,32 @@
 # dependencies = [
 #   "lupa",
 #   "click",
-#   "toml",
+#   "tomli; python_version < '3.11'",
 # ]
 # ///
 
+import functools
+import hashlib
+import json
 import logging
+import os
+import pickle
 import sys
 import re
+import string
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
 
 import click
-import toml
-from lupa import LuaRuntime
+
+# lupa loads the Lua shared library and tomllib is only needed when a config
+# file exists, so both are imported where they are used to keep startup fast
+if TYPE_CHECKING:
+    from lupa import LuaRuntime
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +36,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns for slugify
+_SLUG_STRIP = re.compile(r'[^\w\s-]')
+_SLUG_SPACE = re.compile(r'\s+')
+
+# Translation table deleting exactly the ASCII characters _SLUG_STRIP removes
+_SLUG_ASCII_DELETE = str.maketrans('', '', ''.join(
+    chr(i) for i in range(128) if _SLUG_STRIP.match(chr(i))
+))
+
+# Annotation text "Page XXX actual text @ YYYY-MM-DD HH:MM:SS", with an
+# optional timestamp. Only the first line after the page number is used, and
+# "(?!\s)" keeps the separator after the page from giving whitespace back
+_ANNOTATION_RE = re.compile(
+    r'Page\s+(\d+)\s+(?!\s)'
+    r'(?:(.*)[^\S\n]+@[^\S\n]+(\d{4}-\d{2}-\d{2}[^\S\n]+\d{2}:\d{2}:\d{2})(?=\n|\Z)|(.*))'
+)
+
+# Frontmatter fields whose values are always safe as plain YAML scalars
+_YAML_PLAIN_FIELDS = frozenset({'date_created', 'date_updated'})
+_YAML_LINE_BREAK_ESCAPES = str.maketrans({
+    '\x85': '\\u0085', '\u2028': '\\u2028', '\u2029': '\\u2029',
+})
+
+# Leading name of a str.format field such as "title" in "title.upper"
+_FIELD_NAME_RE = re.compile(r'[^.\[]*')
+
+# KOReader datetime format "YYYY-MM-DD HH:MM:SS", and the days per month
+# for checking its fields (February is checked for leap years separately)
+_DATETIME_RE = re.compile(r'(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)', re.ASCII)
+_DAYS_IN_MONTH = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# KOReader sidecar file name, e.g. "metadata.epub.lua" (not ".lua.old")
+_METADATA_NAME_RE = re.compile(r'metadata\.[^.]+\.lua')
+
+# Start of a non-empty bookmarks table, the braces and strings that delimit
+# its first entry, and a datetime value inside that entry (raw file bytes)
+_BOOKMARKS_START_RE = re.compile(rb'\["bookmarks"\]\s*=\s*\{\s*\[1\]\s*=\s*\{')
+_LUA_BRACE_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}]', re.DOTALL)
+_BOOKMARK_DATETIME_RE = re.compile(rb'\["datetime"\]\s*=\s*"([^"\\]*)"')
+
+# Lazily created Lua runtimes, one per thread: a LuaRuntime must not be
+# entered from several threads at once, but separate runtimes can run in
+# parallel since lupa releases the GIL while executing Lua
+_LUA = threading.local()
+
+
+# Parsed metadata cache in $XDG_CACHE_HOME/koreader-md with one entry per Lua
+# file, valid while the file's mtime and size are unchanged. Bump
+# CACHE_VERSION whenever parsing changes the returned structure. Disabled by
+# --no-cache or by setting KOREADER_MD_NO_CACHE
+CACHE_VERSION = 2
+
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -31,13 +95,8 @@ DEFAULT_CONFIG = {
         "filename_template": "{timestamp}.md",
     },
     "templates": {
-        "yaml_frontmatter": """---
-tags: [buch, gelesen, highlights]
-title: {title}
-author: {lastname}, {firstname}{rating}{note}{date_created}{date_updated}
----
-
-""",
+        # Empty means the built-in frontmatter, which skips absent fields
+        "yaml_frontmatter": "",
         "intro": "Highlights für das Buch {title} von {firstname} {lastname}",
         "summary_note": "> {note}",
         "highlight": "> {text}",
@@ -61,13 +120,13 @@ def load_config(config_path: Optional[Path] = None) -> Dict[str, Any]:
         # Look for config in current directory
         config_path = Path("koreader_converter.toml")
 
-    if not config_path.exists():
-        logger.debug(f"No config file found at {config_path}, using defaults")
-        return DEFAULT_CONFIG
-
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = toml.load(f)
+        with open(config_path, 'rb') as f:
+            if sys.version_info >= (3, 11):
+                import tomllib
+            else:
+                import tomli as tomllib
+            config = tomllib.load(f)
         logger.info(f"Loaded configuration from {config_path}")
 
         # Deep merge with defaults to ensure all required keys exist
@@ -82,11 +141,32 @@ def load_config(config_path: Optional[Path] = None) -> Dict[str, Any]:
             result['templates'].update(config['templates'])
 
         return result
+    except FileNotFoundError:
+        logger.debug(f"No config file found at {config_path}, using defaults")
+        return DEFAULT_CONFIG
     except Exception as e:
         logger.error(f"Failed to load config from {config_path}: {e}")
         return DEFAULT_CONFIG
 
 
+@functools.lru_cache(maxsize=64)
+def _get_template_fields(template: str) -> FrozenSet[str]:
+    """
+    Get the placeholder names referenced by a template.
+
+    Args:
+        template: Template string with placeholders
+
+    Returns:
+        Set of top-level placeholder names
+    """
+    return frozenset(
+        _FIELD_NAME_RE.match(field_name).group(0)
+        for _, field_name, _, _ in string.Formatter().parse(template)
+        if field_name is not None
+    )
+
+
 def format_template(template: str, **kwargs) -> str:
     """
     Format a template string with provided variables.
@@ -99,39 +179,204 @@ def format_template(template: str, **kwargs) -> str:
         Formatted string
     """
     try:
-        # Handle special formatting for page and time in annotations
-        formatted_kwargs = {}
-        for key, value in kwargs.items():
-            if key == 'page' and value:
-                formatted_kwargs[key] = f" (Seite {value})"
-            elif key == 'time' and value:
-                formatted_kwargs[key] = f" @ {value}"
-            else:
-                formatted_kwargs[key] = value
+        # Handle special formatting for page and time in annotations, but
+        # only when the template actually uses them
+        fields = _get_template_fields(template)
+        page = kwargs.get('page') if 'page' in fields else None
+        time_value = kwargs.get('time') if 'time' in fields else None
+
+        # kwargs is already a fresh dict, so it is safe to adjust in place
+        # and hand straight to format_map
+        if page:
+            kwargs['page'] = f" (Seite {page})"
+        if time_value:
+            kwargs['time'] = f" @ {time_value}"
 
         # Format the template
-        result = template.format(**formatted_kwargs)
-
-        # Remove lines that contain only empty placeholders (for YAML)
-        lines = result.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            # Skip lines that have empty field values (like "rating: " or "note: ")
-            if not line.strip().endswith(':') or not line.strip().endswith(': '):
-                cleaned_lines.append(line)
-
-        return '\n'.join(cleaned_lines)
+        return template.format_map(kwargs)
     except KeyError as e:
         logger.warning(f"Missing placeholder in template: {e}")
         return template
 
 
-def parse_lua(file_path: Path) -> Dict[str, Any]:
+def _yaml_quote(value: str) -> str:
+    """
+    Quote free text as a YAML double-quoted scalar.
+
+    JSON strings are valid YAML, so colons, quotes and line breaks in titles
+    or notes cannot break the frontmatter.
+
+    Args:
+        value: Text to quote
+
+    Returns:
+        Quoted scalar
+    """
+    # YAML also treats these as line breaks, JSON leaves them unescaped
+    return json.dumps(value, ensure_ascii=False).translate(_YAML_LINE_BREAK_ESCAPES)
+
+
+def build_yaml_frontmatter(title: str, lastname: str, firstname: str,
+                           **optional: Any) -> str:
+    """
+    Build the default YAML frontmatter, writing optional fields only if set.
+
+    Args:
+        title: Book title
+        lastname: Author's last name
+        firstname: Author's first name
+        **optional: Optional fields (rating, note, date_created, date_updated);
+            empty values are left out
+
+    Returns:
+        YAML frontmatter block
+    """
+    parts = [
+        "---\ntags: [buch, gelesen, highlights]\n",
+        f"title: {_yaml_quote(str(title))}\n",
+        f"author: {_yaml_quote(f'{lastname}, {firstname}')}\n",
+    ]
+    for key, value in optional.items():
+        if value is not None and value != "":
+            if isinstance(value, str) and key not in _YAML_PLAIN_FIELDS:
+                value = _yaml_quote(value)
+            parts.append(f"{key}: {value}\n")
+    parts.append("---\n\n")
+    return "".join(parts)
+
+
+def _get_lua() -> "LuaRuntime":
+    """
+    Return the calling thread's Lua runtime, creating it on first use.
+
+    Returns:
+        LuaRuntime instance owned by the current thread
+    """
+    lua = getattr(_LUA, 'runtime', None)
+    if lua is None:
+        from lupa import LuaRuntime
+        lua = _LUA.runtime = LuaRuntime(unpack_returned_tuples=True)
+    return lua
+
+
+def _lua_to_py(value: Any) -> Any:
+    """
+    Recursively convert Lua tables into native Python containers.
+
+    Tables whose keys are exactly 1..n become lists, all others dicts.
+
+    Args:
+        value: Value returned from the Lua runtime
+
+    Returns:
+        The value with every Lua table replaced by a list or dict
+    """
+    from lupa import lua_type
+
+    def convert(value: Any) -> Any:
+        if lua_type(value) != 'table':
+            return value
+        return _as_sequence_or_dict({key: convert(item) for key, item in value.items()})
+
+    return convert(value)
+
+
+def _as_sequence_or_dict(table: Dict[Any, Any]) -> Any:
+    """
+    Turn a converted Lua table into a list if its keys are exactly 1..n.
+
+    Args:
+        table: Table contents as a dictionary
+
+    Returns:
+        List in index order for sequences, otherwise the dictionary itself
+    """
+    count = len(table)
+    if count and all(type(key) is int and 1 <= key <= count for key in table):
+        return [table[index] for index in range(1, count + 1)]
+    return table
+
+
+def _load_with_lua(file_path: Path) -> Any:
+    """
+    Run a Lua file in the Lua runtime and convert its result.
+
+    Args:
+        file_path: Path to the Lua file
+
+    Returns:
+        Returned value with tables converted to Python containers
+    """
+    lua = _get_lua()
+
+    # Let Lua read and compile the file itself
+    loaded = lua.globals().loadfile(str(file_path))
+    if loaded is None or isinstance(loaded, tuple):
+        error = loaded[1] if isinstance(loaded, tuple) else "unknown error"
+        raise ValueError(error)
+
+    # Move the whole table across the Lua boundary in one pass so later
+    # lookups are plain Python container accesses
+    return _lua_to_py(loaded())
+
+
+def _cache_path(file_path: Path) -> Path:
+    """
+    Get the cache file for a Lua file.
+
+    Args:
+        file_path: Path to the Lua file
+
+    Returns:
+        Path of the pickle cache entry for this path
+    """
+    # Resolved per call: Path.home() can fail, which must not break imports
+    cache_dir = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'koreader-md'
+    key = hashlib.blake2b(os.path.abspath(file_path).encode('utf-8'), digest_size=16).hexdigest()
+    return cache_dir / f"{key}.pkl"
+
+
+def _cache_stamp(stat_result: os.stat_result) -> Tuple[int, int, int]:
+    """
+    Get the stamp a cache entry must carry to be valid.
+
+    Args:
+        stat_result: Result of stat() on the Lua file
+
+    Returns:
+        Tuple of (cache version, mtime in ns, size)
+    """
+    return CACHE_VERSION, stat_result.st_mtime_ns, stat_result.st_size
+
+
+def _write_cache(cache_path: Path, stamp: Tuple[int, int, int], metadata: Any) -> None:
+    """
+    Store parsed metadata in the cache, ignoring any failure.
+
+    Replaces the previous entry for the same file.
+
+    Args:
+        cache_path: Path of the cache entry
+        stamp: Cache stamp of the parsed file state
+        metadata: Parsed metadata as plain Python containers
+    """
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((stamp, metadata), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.debug("Failed to write cache entry %s: %s", cache_path, e)
+
+
+def parse_lua(file_path: Path, use_cache: bool = True) -> Dict[str, Any]:
     """
     Parse a Lua file containing KOReader metadata.
 
     Args:
         file_path: Path to the Lua file
+        use_cache: Read and write the parsed metadata cache
 
     Returns:
         Dictionary containing the parsed metadata
@@ -140,20 +385,37 @@ def parse_lua(file_path: Path) -> Dict[str, Any]:
         FileNotFoundError: If the Lua file doesn't exist
         ValueError: If the Lua content cannot be parsed
     """
-    logger.info(f"Parsing Lua file: {file_path}")
+    logger.debug("Parsing Lua file: %s", file_path)
 
-    if not file_path.exists():
+    try:
+        stat_result = file_path.stat()
+    except FileNotFoundError:
         raise FileNotFoundError(f"Lua file not found: {file_path}")
 
+    # Reuse the parse result of an unchanged file from a previous run
+    cache_path = None
+    if use_cache and not os.environ.get('KOREADER_MD_NO_CACHE'):
+        stamp = _cache_stamp(stat_result)
+        try:
+            cache_path = _cache_path(file_path)
+            with open(cache_path, 'rb') as f:
+                cached_stamp, metadata = pickle.load(f)
+            if cached_stamp == stamp:
+                logger.debug("Loaded cached metadata from %s", cache_path)
+                return metadata
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug("Ignoring unreadable cache entry %s: %s", cache_path, e)
+
     try:
-        lua = LuaRuntime(unpack_returned_tuples=True)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lua_content = file.read()
+        start = time.perf_counter()
 
-        wrapped_content = f"function() {lua_content} end"
-        metadata = lua.eval(wrapped_content)()
+        metadata = _load_with_lua(file_path)
 
-        logger.info("Successfully parsed Lua file")
+        logger.debug("Successfully parsed Lua file in %.1f ms", (time.perf_counter() - start) * 1000)
+        if cache_path is not None:
+            _write_cache(cache_path, stamp, metadata)
         return metadata
 
     except Exception as e:
@@ -161,149 +423,192 @@ def parse_lua(file_path: Path) -> Dict[str, Any]:
         raise ValueError(f"Failed to parse Lua file: {e}")
 
 
+def _strip_parts(parts: List[str]) -> List[str]:
+    """
+    Strip surrounding whitespace from fragments as if they were joined.
+
+    Args:
+        parts: String fragments
+
+    Returns:
+        Fragments whose concatenation equals "".join(parts).strip()
+    """
+    start = 0
+    while start < len(parts) and not parts[start].strip():
+        start += 1
+    end = len(parts)
+    while end > start and not parts[end - 1].strip():
+        end -= 1
+
+    parts = parts[start:end]
+    if parts:
+        parts[0] = parts[0].lstrip()
+        parts[-1] = parts[-1].rstrip()
+    return parts
+
+
 def generate_markdown(metadata: Dict[str, Any], config: Dict[str, Any] = None) -> Tuple[str, str]:
     """
     Generate markdown content from KOReader metadata with YAML frontmatter.
 
     Args:
-        metadata: Dictionary containing KOReader metadata
+        metadata: Dictionary containing KOReader metadata, as returned by parse_lua
         config: Configuration dictionary with templates
 
     Returns:
         Tuple of (markdown_content, timestamp_string)
     """
+    parts, timestamp = generate_markdown_parts(metadata, config)
+    return "".join(parts), timestamp
+
+
+def generate_markdown_parts(metadata: Dict[str, Any], config: Dict[str, Any] = None) -> Tuple[List[str], str]:
+    """
+    Generate markdown content as a list of fragments, without joining them.
+
+    Args:
+        metadata: Dictionary containing KOReader metadata, as returned by parse_lua
+        config: Configuration dictionary with templates
+
+    Returns:
+        Tuple of (markdown_fragments, timestamp_string)
+    """
     if config is None:
         config = DEFAULT_CONFIG
-    logger.info("Generating markdown content")
+    logger.debug("Generating markdown content")
 
     try:
         # Get stats from metadata
-        stats = {}
-        if hasattr(metadata, '__getitem__') and 'stats' in metadata:
-            stats = metadata['stats']
+        stats = metadata.get('stats', {})
 
         # Extract title and authors from stats
-        title = stats['title'] if 'title' in stats else 'Unknown Title'
-        authors = stats['authors'] if 'authors' in stats else 'Unknown Author'
+        title = stats.get('title', 'Unknown Title')
+        authors = stats.get('authors', 'Unknown Author')
 
         # Extract rating and note from summary
-        rating = None
-        summary_note = None
-        if hasattr(metadata, '__getitem__') and 'summary' in metadata:
-            summary = metadata['summary']
-            if 'rating' in summary:
-                rating = summary['rating']
-            if 'note' in summary:
-                summary_note = summary['note']
+        summary = metadata.get('summary', {})
+        rating = summary.get('rating')
+        summary_note = summary.get('note')
 
         # Parse author name
         lastname, firstname = parse_author_name(authors)
 
+        # Build the bookmark list once, newest first, for both the timestamps
+        # and the highlights below
+        bookmarks = metadata.get('bookmarks', {})
+        if isinstance(bookmarks, dict):
+            if all(isinstance(k, int) for k in bookmarks):
+                # Sparse index tables keep insertion order, so sort by index
+                bookmark_list = [bookmarks[k] for k in sorted(bookmarks, reverse=True)]
+            else:
+                bookmark_list = list(bookmarks.values())[::-1]
+        else:
+            bookmark_list = list(bookmarks)[::-1]
+
         # Get timestamps from bookmarks
         created_at = None
         updated_at = None
-        bookmarks = metadata['bookmarks'] if 'bookmarks' in metadata else {}
-        if bookmarks:
-            # Get all bookmarks
-            bookmark_list = []
-            if hasattr(bookmarks, 'values'):
-                bookmark_list = list(bookmarks.values())
-            elif hasattr(bookmarks, '__iter__'):
-                bookmark_list = list(bookmarks)
-
-            if bookmark_list:
-                # Get first bookmark datetime for created_at
-                first_bookmark = bookmark_list[0]
-                if 'datetime' in first_bookmark:
-                    created_at = first_bookmark['datetime']
-
-                # Get last bookmark datetime for updated_at
-                last_bookmark = bookmark_list[-1]
-                if 'datetime' in last_bookmark:
-                    updated_at = last_bookmark['datetime']
-
-        # Generate timestamp for filename from created_at
-        timestamp = None
-        if created_at:
-            timestamp = parse_bookmark_datetime(created_at)
-
-        # Fallback to current time if no bookmark datetime found
-        if timestamp is None:
-            timestamp = generate_timestamp()
+        if bookmark_list:
+            # Get first bookmark datetime for created_at
+            created_at = bookmark_list[-1].get('datetime')
+
+            # Get last bookmark datetime for updated_at
+            updated_at = bookmark_list[0].get('datetime')
+
+        # Generate timestamp for filename from created_at, falling back to
+        # current time if no bookmark datetime found
+        timestamp = parse_bookmark_datetime(created_at) if created_at else generate_timestamp()
 
         # Generate YAML frontmatter using template
         templates = config['templates']
         rating_value = rating if rating is not None else ""
         note_value = summary_note if summary_note else ""
         date_created_value = format_date_for_yaml(created_at) if created_at else ""
-        date_updated_value = format_date_for_yaml(updated_at) if updated_at else ""
-
-        yaml_frontmatter = format_template(
-            templates['yaml_frontmatter'],
-            title=title,
-            lastname=lastname,
-            firstname=firstname,
-            rating=rating_value,
-            note=note_value,
-            date_created=date_created_value,
-            date_updated=date_updated_value
-        )
+        if updated_at == created_at:
+            # Single-bookmark books share one datetime for both fields
+            date_updated_value = date_created_value
+        else:
+            date_updated_value = format_date_for_yaml(updated_at) if updated_at else ""
+
+        if templates['yaml_frontmatter']:
+            yaml_frontmatter = format_template(
+                templates['yaml_frontmatter'],
+                title=title,
+                lastname=lastname,
+                firstname=firstname,
+                rating=rating_value,
+                note=note_value,
+                date_created=date_created_value,
+                date_updated=date_updated_value
+            )
+        else:
+            yaml_frontmatter = build_yaml_frontmatter(
+                title,
+                lastname,
+                firstname,
+                rating=rating_value,
+                note=note_value,
+                date_created=date_created_value,
+                date_updated=date_updated_value
+            )
 
         # Generate intro text using template
-        intro_text = format_template(
+        md_parts = [yaml_frontmatter, format_template(
             templates['intro'],
             title=title,
             firstname=firstname,
             lastname=lastname
-        )
+        )]
 
         if summary_note:
-            intro_text += "\n\n" + format_template(
+            md_parts.append("\n\n")
+            md_parts.append(format_template(
                 templates['summary_note'],
                 note=summary_note
-            )
-        intro_text += "\n\n"
-
-        # Generate highlights content
-        highlights_content = ""
-        bookmarks = metadata['bookmarks'] if 'bookmarks' in metadata else {}
-
-        # Process bookmarks
-        bookmark_list = []
-        if hasattr(bookmarks, 'values'):
-            bookmark_list = list(bookmarks.values())
-        elif hasattr(bookmarks, '__iter__'):
-            bookmark_list = list(bookmarks)
-
-        for bookmark in reversed(bookmark_list):
-            if 'notes' not in bookmark or not bookmark['notes'].strip():
+            ))
+        md_parts.append("\n\n")
+
+        # Generate highlights content, collecting fragments in a list
+        # instead of growing a string
+        highlight_parts = []
+        append = highlight_parts.append
+        highlight_template = templates['highlight']
+        annotation_template = templates['annotation']
+        separator = templates['separator']
+        for bookmark in bookmark_list:
+            notes = bookmark.get('notes')
+            if not notes or not notes.strip():
                 continue
 
             # Add the highlighted text using template
-            highlights_content += format_template(
-                templates['highlight'],
-                text=bookmark['notes']
-            ) + "\n\n"
+            append(format_template(
+                highlight_template,
+                text=notes
+            ))
+            append("\n\n")
 
             # Add annotations if present
-            if 'text' in bookmark and bookmark['text'].strip():
+            text = bookmark.get('text')
+            if text and text.strip():
                 # Parse annotation text to extract page and timestamp
-                annotation_data = parse_annotation_text(bookmark['text'])
+                annotation_data = parse_annotation_text(text)
 
-                highlights_content += format_template(
-                    templates['annotation'],
+                append(format_template(
+                    annotation_template,
                     annotation=annotation_data['text'],
                     page=annotation_data['page'],
                     time=annotation_data['timestamp']
-                ) + "\n\n"
+                ))
+                append("\n\n")
 
-            highlights_content += templates['separator'] + "\n\n"
+            append(separator)
+            append("\n\n")
 
         # Combine all parts
-        md = yaml_frontmatter + intro_text + highlights_content.strip()
+        md_parts.extend(_strip_parts(highlight_parts))
 
-        logger.info("Successfully generated markdown")
-        return md, timestamp
+        logger.debug("Successfully generated markdown")
+        return md_parts, timestamp
 
     except Exception as e:
         logger.error(f"Failed to generate markdown: {e}")
@@ -321,9 +626,12 @@ def slugify(text: str) -> str:
         Slugified string
     """
     text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[\s]+', '-', text)
-    return text.strip('-')
+    if text.isascii():
+        # str.translate avoids the regex engine for plain ASCII titles
+        text = text.translate(_SLUG_ASCII_DELETE)
+    else:
+        text = _SLUG_STRIP.sub('', text)
+    return _SLUG_SPACE.sub('-', text).strip('-')
 
 
 def generate_timestamp() -> str:
@@ -336,6 +644,63 @@ def generate_timestamp() -> str:
     return datetime.now().strftime("%y%m%d%H%M")
 
 
+def _is_canonical_datetime(datetime_str: str) -> bool:
+    """
+    Check for a valid, zero-padded "YYYY-MM-DD HH:MM:SS" datetime.
+
+    Args:
+        datetime_str: Datetime string
+
+    Returns:
+        True if the string can be sliced into its fields directly
+    """
+    match = _DATETIME_RE.fullmatch(datetime_str)
+    if match is None:
+        return False
+
+    # The pattern only checks the shape; reject out-of-range fields the same
+    # way strptime would, without building a datetime
+    year, month, day, hour, minute, second = map(int, match.groups())
+    if not (year >= 1 and 1 <= month <= 12 and hour < 24 and minute < 60 and second < 60):
+        return False
+    if not 1 <= day <= _DAYS_IN_MONTH[month - 1]:
+        return False
+    if month == 2 and day == 29:
+        return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    return True
+
+
+def _slice_timestamp(datetime_str: str) -> str:
+    """
+    Get the YYMMDDHHMM timestamp of a canonical datetime string.
+
+    Args:
+        datetime_str: Datetime string accepted by _is_canonical_datetime
+
+    Returns:
+        Timestamp string in YYMMDDHHMM format
+    """
+    # Canonical strings are zero-padded, so slicing gives the timestamp
+    return (datetime_str[2:4] + datetime_str[5:7] + datetime_str[8:10]
+            + datetime_str[11:13] + datetime_str[14:16])
+
+
+def _parse_irregular_datetime(datetime_str: str) -> Optional[datetime]:
+    """
+    Parse a datetime string that is not in canonical KOReader form.
+
+    Args:
+        datetime_str: Datetime string, e.g. without zero padding
+
+    Returns:
+        Parsed datetime, or None if the string is malformed
+    """
+    try:
+        return datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
 def parse_bookmark_datetime(datetime_str: str) -> str:
     """
     Parse bookmark datetime string and convert to YYMMDDHHMM format.
@@ -346,12 +711,14 @@ def parse_bookmark_datetime(datetime_str: str) -> str:
     Returns:
         Timestamp string in YYMMDDHHMM format
     """
-    try:
-        dt = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
-        return dt.strftime("%y%m%d%H%M")
-    except ValueError:
+    if _is_canonical_datetime(datetime_str):
+        return _slice_timestamp(datetime_str)
+
+    dt = _parse_irregular_datetime(datetime_str)
+    if dt is None:
         logger.warning(f"Failed to parse datetime: {datetime_str}, using current time")
         return generate_timestamp()
+    return dt.strftime("%y%m%d%H%M")
 
 
 def format_date_for_yaml(datetime_str: str) -> str:
@@ -364,12 +731,14 @@ def format_date_for_yaml(datetime_str: str) -> str:
     Returns:
         Date string in YYYY-MM-DD format
     """
-    try:
-        dt = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
-        return dt.strftime("%Y-%m-%d")
-    except ValueError:
+    if _is_canonical_datetime(datetime_str):
+        return datetime_str[:10]
+
+    dt = _parse_irregular_datetime(datetime_str)
+    if dt is None:
         logger.warning(f"Failed to parse datetime: {datetime_str}, using current date")
         return datetime.now().strftime("%Y-%m-%d")
+    return dt.strftime("%Y-%m-%d")
 
 
 def parse_annotation_text(annotation_text: str) -> Dict[str, str]:
@@ -389,21 +758,15 @@ def parse_annotation_text(annotation_text: str) -> Dict[str, str]:
     }
 
     # Pattern: "Page XXX actual text @ YYYY-MM-DD HH:MM:SS"
-    import re
-
-    # Match page pattern
-    page_match = re.match(r'Page\s+(\d+)\s+(.*)', annotation_text)
-    if page_match:
-        result['page'] = page_match.group(1)
-        remaining_text = page_match.group(2)
-
-        # Match timestamp pattern
-        timestamp_match = re.search(r'(.*)\s+@\s+(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})$', remaining_text)
-        if timestamp_match:
-            result['text'] = timestamp_match.group(1).strip()
-            result['timestamp'] = timestamp_match.group(2)
+    match = _ANNOTATION_RE.match(annotation_text)
+    if match:
+        page, text, timestamp, plain_text = match.groups()
+        result['page'] = page
+        if timestamp:
+            result['text'] = text.strip()
+            result['timestamp'] = timestamp
         else:
-            result['text'] = remaining_text.strip()
+            result['text'] = plain_text.strip()
 
     return result
 
@@ -435,39 +798,267 @@ def parse_author_name(author_text: str) -> Tuple[str, str]:
     return lastname.strip(), firstname.strip()
 
 
-def save_markdown(markdown: str, output_path: Path) -> None:
+def save_markdown(markdown: Union[str, Iterable[str]], output_path: Path, ensure_parent: bool = True) -> None:
     """
     Save markdown content to a file.
 
     Args:
-        markdown: Markdown content to save
+        markdown: Markdown content to save, either as one string or as
+            fragments from generate_markdown_parts
         output_path: Path where to save the file
+        ensure_parent: Create parent directories first; callers that already
+            created the output directory can pass False to skip the mkdir
     """
-    logger.info(f"Saving markdown to: {output_path}")
+    logger.debug("Saving markdown to: %s", output_path)
 
     try:
         # Create parent directories if they don't exist
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(markdown)
-
-        logger.info(f"Successfully saved markdown to {output_path}")
+        if ensure_parent:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if isinstance(markdown, str):
+            markdown = (markdown,)
+
+        # Encode fragments into a 64 KiB binary buffer, so typical notes go
+        # out in a single write without joining them into one string first,
+        # then move the finished file into place atomically
+        # The temporary name is unique, so an existing file is never clobbered
+        # and concurrent runs writing the same target don't collide. Mode
+        # 0o666 minus the umask matches what open() would create
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.urandom(6).hex()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with open(fd, 'wb', buffering=1 << 16) as f:
+                for part in markdown:
+                    f.write(part.encode('utf-8'))
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            # Don't leave a half-written temporary file behind
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        logger.debug("Successfully saved markdown to %s", output_path)
 
     except Exception as e:
         logger.error(f"Failed to save markdown to {output_path}: {e}")
         raise IOError(f"Failed to save markdown: {e}")
 
 
+def find_metadata_files(input_dir: Path) -> List[Path]:
+    """
+    Find all KOReader metadata files (metadata.<ext>.lua) in .sdr folders.
+
+    Args:
+        input_dir: Root directory to search
+
+    Returns:
+        List of paths to metadata files
+    """
+    metadata_files = []
+
+    logger.info(f"Searching for metadata files in: {input_dir}")
+
+    # Walk the tree with os.scandir so directory checks use the cached dirent
+    stack = [str(input_dir)]
+    while stack:
+        current_dir = stack.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    # Look for metadata files in .sdr directories, including
+                    # symlinked ones
+                    if entry.name.endswith(".sdr"):
+                        try:
+                            with os.scandir(entry.path) as sdr_entries:
+                                metadata_files.extend(
+                                    sdr_entry.path for sdr_entry in sdr_entries
+                                    if _METADATA_NAME_RE.fullmatch(sdr_entry.name)
+                                )
+                        except OSError:
+                            continue
+                    elif entry.is_dir(follow_symlinks=False):
+                        # Don't recurse through symlinks to avoid cycles
+                        stack.append(entry.path)
+        except OSError as e:
+            logger.warning(f"Cannot scan directory {current_dir}: {e}")
+
+    metadata_files = [Path(p) for p in metadata_files]
+
+    logger.info(f"Found {len(metadata_files)} metadata files")
+    return metadata_files
+
+
+def _peek_timestamp(metadata_file: Path) -> Optional[str]:
+    """
+    Cheaply derive the output timestamp from the raw metadata file.
+
+    Scans the file bytes for the datetime of bookmark [1], so existing
+    outputs can be skipped without running the Lua parser.
+
+    Args:
+        metadata_file: Path to the metadata file
+
+    Returns:
+        Timestamp string in YYMMDDHHMM format, or None if it cannot be
+        determined without a full parse
+    """
+    try:
+        data = metadata_file.read_bytes()
+    except OSError:
+        return None
+
+    bookmarks_match = _BOOKMARKS_START_RE.search(data)
+    if bookmarks_match is None:
+        return None
+
+    # Find the closing brace of bookmark [1] so later bookmarks are not read
+    start = bookmarks_match.end()
+    depth = 1
+    for brace_match in _LUA_BRACE_RE.finditer(data, start):
+        token = brace_match.group(0)
+        if token == b'{':
+            depth += 1
+        elif token == b'}':
+            depth -= 1
+            if depth == 0:
+                end = brace_match.start()
+                break
+    else:
+        return None
+
+    datetime_match = _BOOKMARK_DATETIME_RE.search(data, start, end)
+    if datetime_match is None:
+        return None
+
+    # Anything but a valid canonical datetime is left to the full conversion
+    value = datetime_match.group(1).decode('utf-8', 'replace')
+    if not _is_canonical_datetime(value):
+        return None
+
+    return _slice_timestamp(value)
+
+
+def _init_worker(log_level: int) -> None:
+    """
+    Prepare a worker process for conversions.
+
+    Args:
+        log_level: Logging level of the parent process
+    """
+    logging.getLogger().setLevel(log_level)
+
+
+def _convert_one(metadata_file: Path, app_config: Dict[str, Any], use_cache: bool) -> Tuple[str, str]:
+    """
+    Parse a metadata file and render its markdown (runs in a worker process).
+
+    Args:
+        metadata_file: Path to the metadata file
+        app_config: Loaded configuration dictionary
+        use_cache: Read and write the parsed metadata cache
+
+    Returns:
+        Tuple of (markdown_content, timestamp_string)
+    """
+    # Parse the Lua file
+    metadata = parse_lua(metadata_file, use_cache)
+
+    # Generate markdown content
+    return generate_markdown(metadata, app_config)
+
+
+def convert_batch(metadata_files: List[Path], output_dir: Path, config: Dict[str, Any],
+                  use_cache: bool = True) -> Iterator[Tuple[Path, str, str]]:
+    """
+    Convert metadata files in parallel worker processes and save the results.
+
+    Files whose output already exists in output_dir are skipped, checked
+    before parsing when the timestamp can be peeked from the raw file. All
+    writes happen in the calling process in metadata_files order, so when
+    books share a timestamp the first one in that order is written and the
+    others are skipped, independent of which worker finishes first.
+
+    Args:
+        metadata_files: Paths to the metadata files
+        output_dir: Output directory for markdown files, created if missing
+        config: Loaded configuration dictionary, shared by all workers
+        use_cache: Read and write the parsed metadata cache
+
+    Yields:
+        Tuple of (metadata_file, status, detail) per file, where status is
+        "converted", "skipped" or "failed" and detail is the output filename
+        or the error message
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # List the output directory once instead of stat'ing every target
+    existing = set(os.listdir(output_dir))
+
+    # Skip files whose output already exists before paying for a parse; on a
+    # first run into an empty directory nothing can match, so don't peek
+    if existing:
+        pending_files = []
+        for metadata_file in metadata_files:
+            timestamp = _peek_timestamp(metadata_file)
+            if timestamp is not None and f"{timestamp}.md" in existing:
+                yield metadata_file, "skipped", f"{timestamp}.md"
+            else:
+                pending_files.append(metadata_file)
+    else:
+        pending_files = list(metadata_files)
+
+    if not pending_files:
+        return
+
+    # Files are independent, so convert them in parallel worker processes
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(logging.getLogger().level,),
+    ) as executor:
+        futures = [
+            executor.submit(_convert_one, metadata_file, config, use_cache)
+            for metadata_file in pending_files
+        ]
+
+        # Collect results in submission order so the write/skip decision
+        # does not depend on worker timing
+        for metadata_file, future in zip(pending_files, futures):
+            try:
+                markdown, timestamp = future.result()
+                filename = f"{timestamp}.md"
+                if filename not in existing:
+                    # output_dir was created above
+                    save_markdown(markdown, output_dir / filename, ensure_parent=False)
+            except Exception as e:
+                yield metadata_file, "failed", str(e)
+                continue
+
+            if filename in existing:
+                yield metadata_file, "skipped", filename
+            else:
+                existing.add(filename)
+                yield metadata_file, "converted", filename
+
+
 @click.command()
 @click.argument(
     'lua_file',
-    type=click.Path(exists=True, path_type=Path, dir_okay=False)
+    type=click.Path(exists=True, path_type=Path, dir_okay=False),
+    required=False
 )
 @click.option(
     '--output', '-o',
     type=click.Path(path_type=Path),
-    help='Output file path. If not specified, uses slugified title in current directory.'
+    help='Output file path (required output directory with --batch). If not specified, uses slugified title in current directory.'
+)
+@click.option(
+    '--batch', '-b',
+    type=click.Path(exists=True, path_type=Path, file_okay=False),
+    help='Convert all metadata.*.lua files in .sdr folders below this directory in parallel'
 )
 @click.option(
     '--verbose', '-v',
@@ -479,12 +1070,27 @@ def save_markdown(markdown: str, output_path: Path) -> None:
     type=click.Path(exists=True, path_type=Path, dir_okay=False),
     help='Path to TOML configuration file'
 )
-def main(lua_file: Path, output: Optional[Path], verbose: bool, config: Optional[Path]) -> None:
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Do not read or write the parsed metadata cache in $XDG_CACHE_HOME/koreader-md (~/.cache/koreader-md); '
+         'setting KOREADER_MD_NO_CACHE has the same effect'
+)
+def main(lua_file: Optional[Path], output: Optional[Path], batch: Optional[Path],
+         verbose: bool, config: Optional[Path], no_cache: bool) -> None:
     """
     Convert KOReader Lua metadata file to markdown format.
 
     LUA_FILE: Path to the KOReader Lua metadata file to convert.
+
+    Parsed metadata is cached per file in $XDG_CACHE_HOME/koreader-md and
+    reused while the file is unchanged; pass --no-cache to bypass it.
     """
+    if (lua_file is None) == (batch is None):
+        raise click.UsageError("Pass either LUA_FILE or --batch DIR.")
+    if batch is not None and output is None:
+        raise click.UsageError("--batch requires --output DIR.")
+
     # Configure logging level
     if verbose:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -494,11 +1100,26 @@ def main(lua_file: Path, output: Optional[Path], verbose: bool, config: Optional
         # Load configuration
         config = load_config(config)
 
+        if batch is not None:
+            counts = {"converted": 0, "skipped": 0, "failed": 0}
+            for metadata_file, status, detail in convert_batch(find_metadata_files(batch), output, config, not no_cache):
+                counts[status] += 1
+                if status == "failed":
+                    logger.error("Failed to convert %s: %s", metadata_file, detail)
+
+            click.echo(
+                f"✅ Converted {counts['converted']} files to {output} "
+                f"({counts['skipped']} skipped, {counts['failed']} failed)"
+            )
+            if counts["failed"]:
+                sys.exit(1)
+            return
+
         # Parse the Lua file
-        metadata = parse_lua(lua_file)
+        metadata = parse_lua(lua_file, use_cache=not no_cache)
 
         # Generate markdown content
-        markdown, timestamp = generate_markdown(metadata, config)
+        markdown, timestamp = generate_markdown_parts(metadata, config)
 
         # Determine output path
         if output is None:
@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import koreader_lua_to_markdown
+from koreader_lua_to_markdown import _cache_path, parse_lua
+
+
+@pytest.fixture
+def loads(monkeypatch, tmp_path):
+    """Use a temporary cache and count real loads through the Lua runtime."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("KOREADER_MD_NO_CACHE", raising=False)
+    calls = []
+    load = koreader_lua_to_markdown._load_with_lua
+
+    def counting_load(file_path):
+        calls.append(file_path)
+        return load(file_path)
+
+    monkeypatch.setattr(koreader_lua_to_markdown, "_load_with_lua", counting_load)
+    return calls
+
+
+def write_lua(tmp_path, value, mtime_ns=None):
+    path = tmp_path / "metadata.epub.lua"
+    path.write_text(f'return {{ ["a"] = {value} }}', encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_unchanged_file_is_served_from_cache(tmp_path, loads):
+    path = write_lua(tmp_path, 1)
+    assert parse_lua(path) == {"a": 1}
+    assert parse_lua(path) == {"a": 1}
+    assert len(loads) == 1
+    assert len(list(_cache_path(path).parent.iterdir())) == 1
+
+
+def test_changed_file_replaces_entry(tmp_path, loads):
+    path = write_lua(tmp_path, 1, mtime_ns=1_000_000_000)
+    parse_lua(path)
+    write_lua(tmp_path, 22, mtime_ns=2_000_000_000)
+    assert parse_lua(path) == {"a": 22}
+    assert len(loads) == 2
+    assert len(list(_cache_path(path).parent.iterdir())) == 1
+
+
+def test_cache_version_bump_invalidates(tmp_path, loads, monkeypatch):
+    path = write_lua(tmp_path, 1)
+    parse_lua(path)
+    monkeypatch.setattr(koreader_lua_to_markdown, "CACHE_VERSION", koreader_lua_to_markdown.CACHE_VERSION + 1)
+    assert parse_lua(path) == {"a": 1}
+    assert len(loads) == 2
+
+
+def test_corrupt_entry_is_reparsed_and_rewritten(tmp_path, loads):
+    path = write_lua(tmp_path, 1)
+    parse_lua(path)
+    _cache_path(path).write_bytes(b"not a pickle")
+    assert parse_lua(path) == {"a": 1}
+    assert parse_lua(path) == {"a": 1}
+    assert len(loads) == 2
+
+
+def test_disabled_cache_writes_nothing(tmp_path, loads):
+    path = write_lua(tmp_path, 1)
+    parse_lua(path, use_cache=False)
+    parse_lua(path, use_cache=False)
+    assert len(loads) == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_unresolvable_home_skips_cache(tmp_path, loads, monkeypatch):
+    monkeypatch.delenv("XDG_CACHE_HOME")
+
+    def no_home():
+        raise RuntimeError("Could not determine home directory.")
+
+    monkeypatch.setattr(Path, "home", staticmethod(no_home))
+    path = write_lua(tmp_path, 1)
+    assert parse_lua(path) == {"a": 1}
@@ -0,0 +1,52 @@
+import pytest
+
+from koreader_lua_to_markdown import convert_batch, find_metadata_files
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv("KOREADER_MD_NO_CACHE", "1")
+
+
+def write_book(root, name, datetime_str, notes, count=1):
+    sdr = root / f"{name}.sdr"
+    sdr.mkdir(parents=True)
+    bookmarks = "".join(
+        f'[{i}] = {{ ["datetime"] = "{datetime_str}", ["notes"] = "{notes} {i}" }},\n'
+        for i in range(1, count + 1)
+    )
+    path = sdr / "metadata.epub.lua"
+    path.write_text(
+        f'return {{ ["bookmarks"] = {{ {bookmarks} }}, ["stats"] = {{ ["title"] = "{name}" }} }}',
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_first_book_wins_shared_timestamp(tmp_path, monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    big = write_book(tmp_path / "lib", "Big", "2024-03-05 10:01:00", "big", count=20000)
+    small = write_book(tmp_path / "lib", "Small", "2024-03-05 10:01:00", "small")
+    output_dir = tmp_path / "out"
+
+    results = list(convert_batch([big, small], output_dir, {"output": {}, "templates": {
+        "yaml_frontmatter": "", "intro": "{title}", "summary_note": "> {note}",
+        "highlight": "> {text}", "annotation": "{annotation}", "separator": "---",
+    }}))
+
+    assert [(path, status) for path, status, _ in results] == [
+        (big, "converted"),
+        (small, "skipped"),
+    ]
+    assert "Big" in (output_dir / "2403051001.md").read_text(encoding="utf-8")
+
+
+def test_find_metadata_files(tmp_path):
+    write_book(tmp_path / "lib", "A", "2024-03-05 10:01:00", "a")
+    pdf = tmp_path / "lib" / "sub" / "B.sdr"
+    pdf.mkdir(parents=True)
+    (pdf / "metadata.pdf.lua").write_text("return {}")
+    (pdf / "metadata.pdf.lua.old").write_text("return {}")
+
+    found = sorted(p.relative_to(tmp_path).as_posix() for p in find_metadata_files(tmp_path / "lib"))
+    assert found == ["lib/A.sdr/metadata.epub.lua", "lib/sub/B.sdr/metadata.pdf.lua"]
@@ -0,0 +1,26 @@
+import pytest
+
+from koreader_lua_to_markdown import format_date_for_yaml, parse_bookmark_datetime
+
+
+@pytest.mark.parametrize("value, timestamp, date", [
+    ("2024-03-05 10:20:00", "2403051020", "2024-03-05"),
+    ("2024-3-5 10:20:00", "2403051020", "2024-03-05"),
+    ("2024-02-29 23:59:59", "2402292359", "2024-02-29"),
+])
+def test_valid_datetimes(value, timestamp, date):
+    assert parse_bookmark_datetime(value) == timestamp
+    assert format_date_for_yaml(value) == date
+
+
+@pytest.mark.parametrize("value", [
+    "2024-13-45 99:99:99",
+    "2023-02-29 10:00:00",
+    "2024-04-31 10:00:00",
+    "0000-01-01 00:00:00",
+    "garbage",
+])
+def test_invalid_datetimes_fall_back(value, monkeypatch):
+    monkeypatch.setattr("koreader_lua_to_markdown.generate_timestamp", lambda: "now")
+    assert parse_bookmark_datetime(value) == "now"
+    assert format_date_for_yaml(value) != value[:10]
@@ -0,0 +1,20 @@
+import pytest
+
+from koreader_lua_to_markdown import parse_annotation_text
+
+
+@pytest.mark.parametrize("annotation, page, text, timestamp", [
+    ("Page 12 my thought @ 2024-03-05 10:21:00", "12", "my thought", "2024-03-05 10:21:00"),
+    ("Page 12 my thought @ 2024-03-05  10:21:00", "12", "my thought", "2024-03-05  10:21:00"),
+    # Only the first line after the page number is used
+    ("Page 12 first line @ 2024-03-05 10:21:00\nsecond line", "12", "first line", "2024-03-05 10:21:00"),
+    ("Page 12 first line\nsecond line @ 2024-03-05 10:21:00", "12", "first line", ""),
+    ("Page 7   ", "7", "", ""),
+    ("Page 7\n\n", "7", "", ""),
+    # No text before the "@": the separator after the page is not reused
+    ("Page 12  @ 2024-03-05 10:21:00", "12", "@ 2024-03-05 10:21:00", ""),
+    ("Page 3 text @ 2024-03-05 10:21:00 trailing", "3", "text @ 2024-03-05 10:21:00 trailing", ""),
+    ("plain note", "", "plain note", ""),
+])
+def test_parse_annotation_text(annotation, page, text, timestamp):
+    assert parse_annotation_text(annotation) == {"page": page, "text": text, "timestamp": timestamp}
@@ -0,0 +1,59 @@
+import pytest
+
+from koreader_lua_to_markdown import parse_lua
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv("KOREADER_MD_NO_CACHE", "1")
+
+
+def write_lua(tmp_path, source):
+    path = tmp_path / "metadata.epub.lua"
+    path.write_text(source, encoding="utf-8")
+    return path
+
+
+def test_converts_tables(tmp_path):
+    path = write_lua(tmp_path, (
+        '-- we can read Lua syntax here!\n'
+        'return {\n'
+        '    ["bookmarks"] = {\n'
+        '        [1] = { ["datetime"] = "2024-03-05 10:20:00", ["notes"] = "a\\n\\"b\\"" },\n'
+        '        [2] = { ["datetime"] = "2024-03-06 11:00:00" },\n'
+        '    },\n'
+        '    ["sparse"] = { [1] = "a", [3] = "c" },\n'
+        '    ["percent_finished"] = 0.5,\n'
+        '    ["flag"] = true,\n'
+        '}\n'
+    ))
+    assert parse_lua(path) == {
+        "bookmarks": [
+            {"datetime": "2024-03-05 10:20:00", "notes": 'a\n"b"'},
+            {"datetime": "2024-03-06 11:00:00"},
+        ],
+        "sparse": {1: "a", 3: "c"},
+        "percent_finished": 0.5,
+        "flag": True,
+    }
+
+
+def test_keeps_integers_exact(tmp_path):
+    path = write_lua(tmp_path, 'return { ["id"] = 123456789012345678 }')
+    assert parse_lua(path) == {"id": 123456789012345678}
+
+
+def test_trailing_whitespace_and_comments(tmp_path):
+    path = write_lua(tmp_path, 'return { ["a"] = 1 }' + "\r\n" * 50 + "-- trailing comment")
+    assert parse_lua(path) == {"a": 1}
+
+
+def test_invalid_lua_raises_value_error(tmp_path):
+    path = write_lua(tmp_path, 'return {')
+    with pytest.raises(ValueError):
+        parse_lua(path)
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        parse_lua(tmp_path / "missing.lua")
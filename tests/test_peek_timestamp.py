@@ -0,0 +1,35 @@
+import pytest
+
+from koreader_lua_to_markdown import _peek_timestamp
+
+
+@pytest.mark.parametrize("source, expected", [
+    # Canonical datetime in bookmark [1]
+    ('return { ["bookmarks"] = { [1] = { ["datetime"] = "2024-03-05 10:20:00" },'
+     ' [2] = { ["datetime"] = "2024-03-06 11:00:00" } } }', "2403051020"),
+    # Braces and escaped quotes inside strings of bookmark [1]
+    ('return { ["bookmarks"] = { [1] = { ["notes"] = "a } \\" { b", ["pos"] = { ["x"] = 1 },'
+     ' ["datetime"] = "2024-03-05 10:20:00" }, [2] = { ["datetime"] = "2024-03-06 11:00:00" } } }',
+     "2403051020"),
+    # Bookmark [1] without a datetime must not use the one of [2]
+    ('return { ["bookmarks"] = { [1] = { ["notes"] = "a } b" },'
+     ' [2] = { ["datetime"] = "2024-03-06 11:00:00" } } }', None),
+    # Non-canonical datetimes are left to the full conversion
+    ('return { ["bookmarks"] = { [1] = { ["datetime"] = "2024-3-5 10:20:00" },'
+     ' [2] = { ["datetime"] = "2024-03-06 11:00:00" } } }', None),
+    ('return { ["bookmarks"] = { [1] = { ["datetime"] = "2024-13-45 99:99:99" } } }', None),
+    # Bookmarks not starting with [1]
+    ('return { ["bookmarks"] = { [2] = { ["datetime"] = "2024-03-06 11:00:00" },'
+     ' [1] = { ["datetime"] = "2024-03-05 10:20:00" } } }', None),
+    ('return { ["bookmarks"] = {} }', None),
+    # Truncated file
+    ('return { ["bookmarks"] = { [1] = { ["datetime"] = "2024-03-05 10:20:00"', None),
+])
+def test_peek_timestamp(tmp_path, source, expected):
+    path = tmp_path / "metadata.epub.lua"
+    path.write_text(source, encoding="utf-8")
+    assert _peek_timestamp(path) == expected
+
+
+def test_peek_timestamp_missing_file(tmp_path):
+    assert _peek_timestamp(tmp_path / "missing.lua") is None
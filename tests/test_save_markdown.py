@@ -0,0 +1,32 @@
+import os
+import stat
+
+import pytest
+
+from koreader_lua_to_markdown import save_markdown
+
+
+def test_writes_parts_and_leaves_other_files_alone(tmp_path):
+    output_path = tmp_path / "out.md"
+    (tmp_path / "out.md.tmp").write_text("user file")
+
+    save_markdown(["# Title", "\n\n", "Ünïcode"], output_path)
+
+    assert output_path.read_text(encoding="utf-8") == "# Title\n\nÜnïcode"
+    assert sorted(os.listdir(tmp_path)) == ["out.md", "out.md.tmp"]
+    assert (tmp_path / "out.md.tmp").read_text() == "user file"
+
+
+def test_uses_default_permissions(tmp_path):
+    umask = os.umask(0o002)
+    try:
+        save_markdown("x", tmp_path / "out.md")
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((tmp_path / "out.md").stat().st_mode) == 0o664
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path):
+    with pytest.raises(IOError):
+        save_markdown(["ok", "\ud800"], tmp_path / "out.md")
+    assert os.listdir(tmp_path) == []